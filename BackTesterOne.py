@@ -1,12 +1,58 @@
 
 
+import hashlib
+import os
+
 import pandas as pd
 import numpy as np
-import yfinance as yf
-import matplotlib.pyplot as plt
+from curl_cffi import requests as curl_requests
+import matplotlib
 import tkinter as tk
 from tkinter import ttk
 
+from backtester import compute_strategy, grid_backtest, max_drawdown, rolling_two_sma
+
+
+# Downloaded price data is cached here, one Parquet file per (ticker, start, end)
+CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "smabh")
+
+# Yahoo Finance daily chart endpoint, queried directly for the adjusted close only
+CHART_URL = "https://query1.finance.yahoo.com/v8/finance/chart/{ticker}"
+
+# One HTTP session for every download, so repeated runs reuse the same connection and cookies
+SESSION = curl_requests.Session(impersonate="chrome")
+
+# Set SMABH_HEADLESS for sweeps / CI: renders with Agg and never opens a window
+HEADLESS = bool(os.environ.get("SMABH_HEADLESS"))
+if HEADLESS:
+    matplotlib.use("Agg")
+import matplotlib.pyplot as plt
+
+
+
+
+def _metrics(net_returns, cumulative_returns, n_days):
+    """
+    Compute the performance metrics from the backtest result arrays.
+
+    The arrays start at the first valid row, whose return is NaN (no prior signal).
+    """
+    returns = net_returns[1:]
+    cumulative_returns = cumulative_returns[1:]
+
+    # Basic metrics
+    total_return = cumulative_returns[-1] - 1
+    annualized_return = (1 + total_return) ** (252/n_days) - 1
+    sharpe_ratio = np.sqrt(252) * returns.mean() / returns.std(ddof=1)
+    drawdown = max_drawdown(cumulative_returns)  # Single running-peak scan
+
+    return {
+        'total_return': float(total_return),
+        'annualized_return': float(annualized_return),
+        'sharpe_ratio': float(sharpe_ratio),
+        'max_drawdown': float(drawdown)
+    }
+
 
 
 
@@ -32,14 +78,24 @@ class Backtester:
         start_date (str): The start date of the backtest period.
         end_date (str): The end date of the backtest period.
         data (pandas.DataFrame): Historical price data for the specified stock and date range.
-        results (None): Placeholder for backtest results, initialised as null.
+        _price (np.ndarray): The price column as a C-contiguous float32 array, set by _load_data().
+        _start, _dates, _short_ma, _long_ma, _signal, _positions, _net_returns, _cumret, _buyhold_cumret (None):
+            Placeholders for the backtest results (NumPy arrays), initialised as null.
         cumulative_returns (None): Placeholder for cumulative returns, initialised as null.
         """
         self.ticker = ticker
         self.start_date = start_date
         self.end_date = end_date
         self.data = self._load_data()
-        self.results = None
+        self._start = None
+        self._dates = None
+        self._short_ma = None
+        self._long_ma = None
+        self._signal = None
+        self._positions = None
+        self._net_returns = None
+        self._cumret = None
+        self._buyhold_cumret = None
         self.cumulative_returns = None
 
 
@@ -56,8 +112,11 @@ class Backtester:
         PRIVATE METHOD
         Fetch historical price data from Yahoo Finance for the specified stock and date range.
 
-        This method uses the yfinance library to download historical stock data.
-        It retrieves the Adjusted Close price (named price for simplicity)
+        This method queries the Yahoo Finance chart API directly for daily bars.
+        It retrieves only the Adjusted Close price (named price for simplicity), stored as float32
+        Downloads are cached to Parquet under CACHE_DIR, so re-running with the
+        same ticker and dates skips the network entirely.
+        Also sets self._price, the C-contiguous float32 array every kernel runs on.
 
         Returns:
         - pandas.DataFrame: A DataFrame containing the historical price data.
@@ -65,8 +124,44 @@ class Backtester:
                               which contains the adjusted closing prices for each trading day.
 
         """
-        data = yf.download(self.ticker, start=self.start_date, end=self.end_date, auto_adjust=False) #auto-adjust false ensures a column for adjusted close and close prices
-        return data[['Adj Close']].rename(columns={'Adj Close': 'price'})
+        key = hashlib.sha1(f"{self.ticker}|{self.start_date}|{self.end_date}".encode()).hexdigest()
+        path = os.path.join(CACHE_DIR, f"{key}.parquet")
+        if os.path.exists(path):
+            data = pd.read_parquet(path, engine='pyarrow').astype(np.float32)
+        else:
+            response = SESSION.get(
+                CHART_URL.format(ticker=self.ticker),
+                params={
+                    'period1': int(pd.Timestamp(self.start_date).timestamp()),
+                    'period2': int(pd.Timestamp(self.end_date).timestamp()),  # End date is exclusive, as with yfinance
+                    'interval': '1d',
+                    'events': 'history',
+                    'includeAdjustedClose': 'true',
+                },
+            )
+            response.raise_for_status()
+            chart = response.json()['chart']['result'][0]
+
+            # Pull the adjusted close straight into a float32 array (missing bars come back as null -> NaN)
+            price = np.array(chart['indicators']['adjclose'][0]['adjclose'], dtype=np.float32)  # float32 is plenty for quoted prices, halves memory traffic
+            dates = (
+                pd.to_datetime(chart['timestamp'], unit='s', utc=True)
+                .tz_convert(chart['meta']['exchangeTimezoneName'])
+                .normalize()
+                .tz_localize(None)
+            )
+            data = pd.DataFrame({'price': price}, index=pd.DatetimeIndex(dates, name='Date')).dropna()
+
+            # Only cache successful downloads
+            if not data.empty:
+                os.makedirs(CACHE_DIR, exist_ok=True)
+                data.to_parquet(path, engine='pyarrow', compression='zstd')
+
+        # Single price column from here on, converted to an array once for the whole pipeline
+        assert data.shape[1] == 1, "expected a single price column"
+        data.columns = ['price']
+        self._price = np.ascontiguousarray(data['price'].to_numpy(dtype=np.float32))
+        return data
 
     
 
@@ -93,24 +188,10 @@ class Backtester:
 
         """
 
-        if self.results is None:
+        if self._cumret is None:
             raise ValueError("Backtest not run yet.")
 
-        returns = self.results['net_returns']
-        cumulative_returns = self.results['cumulative_returns']
-
-        # Basic metrics
-        total_return = cumulative_returns.iloc[-1]
-        annualized_return = (1 + total_return) ** (252/len(self.data)) - 1
-        sharpe_ratio = np.sqrt(252) * returns.mean() / returns.std()
-        max_drawdown = (cumulative_returns / cumulative_returns.cummax() - 1).min()
-
-        return {
-            'total_return': total_return,
-            'annualized_return': annualized_return,
-            'sharpe_ratio': sharpe_ratio,
-            'max_drawdown': max_drawdown
-        }
+        return _metrics(self._net_returns, self._cumret, len(self.data))
 
     
 
@@ -134,43 +215,43 @@ class Backtester:
             
             
         Populates:
-            self.results (DataFrame): Contains all intermediate calculations
-            self.cumulative_returns (Series): Cumulative return series
+            self._short_ma, self._long_ma, self._signal, self._positions,
+            self._net_returns, self._cumret, self._buyhold_cumret (np.ndarray): Intermediate calculations
+            self._start (int): First row of self._price the results above line up with
+            self._dates (DatetimeIndex): Trading days matching the arrays above
+            self.cumulative_returns (np.ndarray): Cumulative return series
 
         """
 
-        data = self.data.copy()
-        
+        # The kernels don't bounds-check, so reject windows that would index outside the prices
+        if short_window < 1 or long_window < 1:
+            raise ValueError("short_window and long_window must be at least 1")
+
          #Calculate short/long moving averages
-        price_series = data['price'].squeeze()  # Convert DataFrame column to Series
-        data['short_ma'] = price_series.rolling(short_window).mean()
-        data['long_ma'] = price_series.rolling(long_window).mean()
-        
-        #Generate buy/sell signals based on MA crossovers
-        data['signal'] = np.where(data['short_ma'] > data['long_ma'], 1, -1)
-        data['positions'] = data['signal'].diff()
-        
-        # Remove NaN values
-        data = data.dropna()
-        
-        # Calculate returns accounting for transaction costs
-        data['strategy_returns'] = (
-        data['signal'].shift(1)      # Series
-        * price_series.pct_change()  # Series
-    )
-        
+        price = self._price
+        short_ma, long_ma = rolling_two_sma(price, short_window, long_window)  # Both MAs in one pass
 
-        # Store results in self.results DataFrame
-        data['transaction_costs'] = np.abs(data['positions'].shift(1)) * transaction_cost
-        data['net_returns'] = data['strategy_returns'] - data['transaction_costs']
-        data['cumulative_returns'] = (1 + data['net_returns']).cumprod()
-        
+        #Generate signals, returns net of transaction costs, strategy and buy & hold cumulative returns in one fused pass
+        net_returns, cumulative_returns, buyhold_cumret, signal = compute_strategy(price, short_ma, long_ma, transaction_cost)
+
+        # Skip warm-up rows: both MAs exist from max(window) - 1, and row 0 has no position change.
+        # Returns stay NaN on this first row, as before
+        start = max(short_window, long_window, 2) - 1
 
 
 
-        # Return performance metrics from compute_metrics()
-        self.results = data
-        self.cumulative_returns = data['cumulative_returns']
+
+        # Store results as NumPy views from start (no copy), return performance metrics from compute_metrics()
+        self._start = start
+        self._dates = self.data.index[start:]
+        self._short_ma = short_ma[start:]
+        self._long_ma = long_ma[start:]
+        self._signal = signal[start:]
+        self._positions = np.diff(signal[start - 1:])
+        self._net_returns = net_returns[start:]
+        self._cumret = cumulative_returns[start:]
+        self._buyhold_cumret = buyhold_cumret[start:]
+        self.cumulative_returns = self._cumret
         return self.compute_metrics()
     
 
@@ -179,9 +260,53 @@ class Backtester:
 
 
 
-    def plot_results(self):
+    def run_grid(self, shorts, longs, transaction_cost=0.001):
+        """
+        Backtest every (short_window, long_window) combination.
+
+        All pairs run inside one parallel Numba kernel (grid_backtest) that
+        shares the price array, instead of one Python-level backtest per pair.
+
+        Param:
+            shorts (iterable of int): Short moving average windows to try
+            longs (iterable of int): Long moving average windows to try
+            transaction_cost (float, optional): Percentage cost per transaction. Defaults to 0.1%
+
+        Returns a DataFrame indexed by (short_window, long_window) with one
+        column per metric from compute_metrics().
         """
-        Visualize backtest results with two subplots:
+        price = self._price
+        index = pd.MultiIndex.from_product([list(shorts), list(longs)], names=['short_window', 'long_window'])
+
+        # grid_backtest doesn't bounds-check either, so validate every window up front
+        if (index.to_frame() < 1).any(axis=None):
+            raise ValueError("All short and long windows must be at least 1")
+
+        total_return, sharpe_ratio, max_drawdown = grid_backtest(
+            price,
+            index.get_level_values('short_window').to_numpy(dtype=np.int64),
+            index.get_level_values('long_window').to_numpy(dtype=np.int64),
+            transaction_cost,
+        )
+
+        return pd.DataFrame({
+            'total_return': total_return,
+            'annualized_return': (1 + total_return) ** (252/len(self.data)) - 1,
+            'sharpe_ratio': sharpe_ratio,
+            'max_drawdown': max_drawdown
+        }, index=index)
+    
+
+
+
+
+
+
+    def build_figure(self):
+        """
+        Build the backtest results figure without displaying it.
+
+        Returns the matplotlib Figure, with two subplots:
         - Price series with moving averages and trading signals
         - Cumulative returns vs buy-and-hold strategy
         
@@ -195,29 +320,41 @@ class Backtester:
             Lower plot compares:
             - Strategy cumulative returns
             - Buy-and-hold cumulative returns
+
+        In headless mode (SMABH_HEADLESS) it can be saved with fig.savefig(...).
         """
-        if self.results is None:
+        if self._cumret is None:
             raise ValueError("Backtest not run yet.")
+
+        # Only build a DataFrame here, where matplotlib wants the date index
+        results = pd.DataFrame({
+            'price': self._price[self._start:],
+            'short_ma': self._short_ma,
+            'long_ma': self._long_ma,
+            'positions': self._positions,
+            'cumulative_returns': self._cumret,
+            'buyhold_cumret': self._buyhold_cumret,
+        }, index=self._dates)
             
         fig, (ax1, ax2) = plt.subplots(2, 1, figsize=(12, 8), sharex=True)
         
         # Price and moving averages
-        ax1.plot(self.results['price'], label='Adj Close')
-        ax1.plot(self.results['short_ma'], label=f'Short MA ({self.results["short_ma"].count()})')
-        ax1.plot(self.results['long_ma'], label=f'Long MA ({self.results["long_ma"].count()})')
+        ax1.plot(results['price'], label='Adj Close')
+        ax1.plot(results['short_ma'], label=f'Short MA ({results["short_ma"].count()})')
+        ax1.plot(results['long_ma'], label=f'Long MA ({results["long_ma"].count()})')
         ax1.set_title(f'{self.ticker} Price and Moving Averages')
         ax1.set_ylabel("Price (USD)")
         ax1.legend()
         
         # Buy/sell signals
-        buys = self.results[self.results['positions'] > 0]
-        sells = self.results[self.results['positions'] < 0]
+        buys = results[results['positions'] > 0]
+        sells = results[results['positions'] < 0]
         ax1.scatter(buys.index, buys['price'], marker='^', color='g', label='Buy')
         ax1.scatter(sells.index, sells['price'], marker='v', color='r', label='Sell')
         
         # Cumulative returns - Buy Hold Strategy Plots
-        ax2.plot(self.results['cumulative_returns'], label='MA Strategy')
-        ax2.plot((1 + self.results['price'].pct_change()).cumprod(), label='Buy & Hold')
+        ax2.plot(results['cumulative_returns'], label='MA Strategy')
+        ax2.plot(results['buyhold_cumret'], label='Buy & Hold')
         ax2.set_title('Cumulative Returns')
         ax2.set_ylabel("Cumulative Returns (Normalised to 1)")
         ax2.legend()
@@ -225,31 +362,63 @@ class Backtester:
     
         fig.canvas.manager.set_window_title("Buy & Hold Strategy VS SMA Strategy for " + self.ticker + " from " + self.start_date + " to " + self.end_date)
         
-        plt.tight_layout()
-        plt.show()
+        fig.tight_layout()
+        return fig
+    
+
+
+
+
+
+
+    def show(self, fig):
+        """
+        Display fig in a window. In headless mode it is closed instead, so pyplot
+        doesn't keep it alive; the Figure object can still be saved with savefig().
+        """
+        if HEADLESS:
+            plt.close(fig)
+        else:
+            plt.show()
+    
+
+
+
+
 
 
+    def plot_results(self):
+        """
+        Visualize backtest results (see build_figure()) and show them in a window.
+
+        Returns the Figure, e.g. for fig.savefig(...) in headless mode.
+        """
+        fig = self.build_figure()
+        self.show(fig)
+        return fig
 
 
 
 
 
 
-def backtextAPI(root, ticker, endYear, endMonth, endDay, startYear, startMonth, startDay, shortSMA, longSMA):
+
+
+def backtextAPI(root, entries):
 
     """ 
     Helper function for the form.
-    Retrieves form data from the Tkinter Widgets.
+    Retrieves form data from the Tkinter Widgets (entries, as built by make_field()).
     Executes backtest using this data and calls functions to plot the results.
     """
 
 
     #Retrieves form data, and converts it to appropriate format
-    actualStart = startYear.get() + "-" + startMonth.get() + "-" + startDay.get()
-    actualEnd = endYear.get() + "-" + endMonth.get() + "-" + endDay.get()
-    tickerGet = ticker.get().upper()
-    longSMAGet = int(longSMA.get())
-    shortSMAGet = int(shortSMA.get())
+    actualStart = "-".join(entry.get() for entry in entries['start'])
+    actualEnd = "-".join(entry.get() for entry in entries['end'])
+    tickerGet = entries['ticker'].get().upper()
+    longSMAGet = int(entries['longSMA'].get())
+    shortSMAGet = int(entries['shortSMA'].get())
 
     #Destroys form and widgets
     root.destroy()
@@ -276,10 +445,12 @@ def backtextAPI(root, ticker, endYear, endMonth, endDay, startYear, startMonth,
         
         # Print results
         print("Backtest Results:")
-        resultsContent = ""
-        for k, v in metrics.items():
-            #Formats into a string paragraph for both Tkinter and terminal output.
-            resultsContent = resultsContent + f"{k.replace('_', ' ').title():<20} {v:.2%}\n" if isinstance(v, float) else f"{k.replace('_', ' ').title():<20} {v:.2f}\n"
+        #Formats into a string paragraph for both Tkinter and terminal output.
+        lines = [
+            f"{k.replace('_', ' ').title():<20} {v:.2%}" if isinstance(v, float) else f"{k.replace('_', ' ').title():<20} {v:.2f}"
+            for k, v in metrics.items()
+        ]
+        resultsContent = "\n".join(lines) + "\n"
 
 
         #Prints to terminal
@@ -306,87 +477,74 @@ def backtextAPI(root, ticker, endYear, endMonth, endDay, startYear, startMonth,
 
 
 
-# Executes when the python script is executed directly.
-if __name__ == "__main__":
+# Form layout: (label, key, kind). kind "date" is a Year/Month/Day entry group, None is a single entry
+FIELDS = [
+    ("Stock Ticker Code:", "ticker", None),
+    ("Start (YYYY/MM/DD):", "start", "date"),
+    ("End (YYYY/MM/DD):", "end", "date"),
+    ("Short SMA Days (rec: 50):", "shortSMA", None),
+    ("Long SMA Days (rec: 200):", "longSMA", None),
+]
 
 
-    ## Form GUI code
 
-    window = tk.Tk()
-    window.title("Buy and Hold Vs SMA BackTest")
-    window.resizable(False, False)
 
-    root = tk.Frame(window)
-    root.grid(row=0,column=0)
-
-    
+def make_field(root, row, spec):
+    """
+    Add one labelled form field to the grid.
 
-    # Ticker field
+    Returns {key: entry} for a single entry, or {key: (year, month, day)} entries for a date.
+    """
+    label, key, kind = spec
     tk.Label(
         root,
-        text="Stock Ticker Code:",
-    ).grid(row=0, column=1, padx=5, pady=5, sticky=tk.E)
-    ticker = ttk.Entry(root)
-    ticker.grid(row=0, column=2, padx=5, pady=5, ipadx=5)
+        text=label,
+    ).grid(row=row, column=1, padx=5, pady=5, sticky=tk.E)
 
-    # Start Date field
-    tk.Label(
-        root,
-        text="Start (YYYY/MM/DD):",
-    ).grid(row=1, column=1, padx=5, pady=5, sticky=tk.E)
-    startDate = tk.Frame(root)
-    startDate.grid(row=1, column=2)
-    startYear = ttk.Entry(startDate, width=8)
-    startYear.grid(row=0, column=1, padx=4, pady=5)
-    startMonth = ttk.Entry(startDate, width=4)
-    startMonth.grid(row=0, column=2, padx=2, pady=5)
-    startDay = ttk.Entry(startDate, width=4)
-    startDay.grid(row=0, column=3, padx=2, pady=5)
+    if kind == "date":
+        frame = tk.Frame(root)
+        frame.grid(row=row, column=2)
+        parts = []
+        for column, width in enumerate((8, 4, 4), start=1):
+            part = ttk.Entry(frame, width=width)
+            part.grid(row=0, column=column, padx=4 if column == 1 else 2, pady=5)
+            parts.append(part)
+        return {key: tuple(parts)}
 
-    
+    entry = ttk.Entry(root)
+    entry.grid(row=row, column=2, padx=5, pady=5, ipadx=5)
+    return {key: entry}
 
-    # End Date field
-    tk.Label(
-        root,
-        text="End (YYYY/MM/DD):",
-    ).grid(row=2, column=1, padx=5, pady=5, sticky=tk.E)
-    endDate = tk.Frame(root)
-    endDate.grid(row=2, column=2)
-    endYear = ttk.Entry(endDate, width=8)
-    endYear.grid(row=0, column=1, padx=4, pady=5)
-    endMonth = ttk.Entry(endDate, width=4)
-    endMonth.grid(row=0, column=2, padx=2, pady=5)
-    endDay = ttk.Entry(endDate, width=4)
-    endDay.grid(row=0, column=3, padx=2, pady=5)
 
 
-    
 
-   
+# Executes when the python script is executed directly.
+if __name__ == "__main__":
 
-    # Short SMA Days field
-    tk.Label(
-        root,
-        text="Short SMA Days (rec: 50):",
-    ).grid(row=3, column=1, padx=5, pady=5, sticky=tk.E)
-    shortSMA = ttk.Entry(root)
-    shortSMA.grid(row=3, column=2, padx=5, pady=5, ipadx=5)
 
-    # Long SMA Days  field
-    tk.Label(
-        root,
-        text="Long SMA Days (rec: 200):",
-    ).grid(row=4, column=1, padx=5, pady=5, sticky=tk.E)
-    longSMA = ttk.Entry(root)
-    longSMA.grid(row=4, column=2, padx=5, pady=5, ipadx=5)
+    ## Form GUI code
+
+    window = tk.Tk()
+    window.title("Buy and Hold Vs SMA BackTest")
+    window.resizable(False, False)
+
+    root = tk.Frame(window)
+    root.grid(row=0,column=0)
+
+    
+
+    # Form fields, one row each
+    entries = {}
+    for row, spec in enumerate(FIELDS):
+        entries.update(make_field(root, row, spec))
 
     # Submit button
     submit = ttk.Button(
         root,
         text="Submit",
-        command= lambda: backtextAPI(root, ticker, endYear, endMonth, endDay, startYear, startMonth, startDay, shortSMA, longSMA)
+        command= lambda: backtextAPI(root, entries)
     )
-    submit.grid(row=5, column=2, padx=5, pady=5, sticky=tk.E)
+    submit.grid(row=len(FIELDS), column=2, padx=5, pady=5, sticky=tk.E)
 
 
     #Displays initial form.
@@ -0,0 +1,32 @@
+"""
+Numba kernels used by the Backtester engine.
+
+The hot loops of the SMA crossover backtest live here so they can be
+compiled once and shared between the single run and any parameter sweeps.
+
+Every kernel is compiled with cache=True, so the machine code is stored
+under __pycache__ and later processes load it instead of recompiling.
+Importing this package also runs each kernel once on a tiny input of the
+same types the Backtester uses (float32 prices, int windows), so the
+specialisation is ready before the first real backtest.
+"""
+
+import numpy as np
+
+from ._kernels import compute_strategy, grid_backtest, max_drawdown, rolling_two_sma
+
+
+
+
+def _warm_up():
+    """
+    Call every kernel on a 4-day dummy series to trigger (or load) compilation.
+    """
+    price = np.ones(4, dtype=np.float32)
+    short_ma, long_ma = rolling_two_sma(price, 2, 3)
+    _, cumret, _, _ = compute_strategy(price, short_ma, long_ma, 0.001)
+    max_drawdown(cumret[2:])
+    grid_backtest(price, np.array([2], dtype=np.int64), np.array([3], dtype=np.int64), 0.001)
+
+
+_warm_up()
@@ -0,0 +1,188 @@
+import numpy as np
+from numba import njit, prange
+
+
+
+
+@njit(cache=True, fastmath=True)
+def rolling_two_sma(p, sw, lw):
+    """
+    Compute the short and long simple moving averages in a single pass.
+
+    Two running sums are kept (add the newest price, subtract the one leaving
+    the window) so each average costs O(N) regardless of window length.
+
+    Param:
+        p (np.ndarray): Price series
+        sw (int): Number of days for the short moving average
+        lw (int): Number of days for the long moving average
+
+    Returns (short_ma, long_ma) in the dtype of p, NaN until each window is full
+    (same as pandas rolling(W).mean()). The running sums are kept in float64.
+    """
+    n = len(p)
+    out_short = np.empty_like(p)
+    out_long = np.empty_like(p)
+    out_short[:] = np.nan
+    out_long[:] = np.nan
+    s_short = 0.0
+    s_long = 0.0
+
+    for i in range(n):
+        s_short += p[i]
+        s_long += p[i]
+
+        #Drop the price leaving each window
+        if i >= sw:
+            s_short -= p[i - sw]
+        if i >= lw:
+            s_long -= p[i - lw]
+
+        if i >= sw - 1:
+            out_short[i] = s_short / sw
+        if i >= lw - 1:
+            out_long[i] = s_long / lw
+
+    return out_short, out_long
+
+
+
+
+@njit(cache=True)
+def compute_strategy(price, short_ma, long_ma, tc):
+    """
+    Run the crossover strategy over the price series in a single loop.
+
+    Fuses signal generation, strategy returns, transaction costs and the
+    cumulative return. The cumulative return is built as exp of a running sum
+    of log1p(net), which stays accurate on long series where a running product
+    would under/overflow. The buy-and-hold cumulative return is tracked in the
+    same loop from the price ratio already computed for the strategy. Rows
+    before both moving averages are available (plus the first row after that,
+    which has no prior signal) are left as NaN, matching the old
+    dropna()/shift(1) behaviour.
+
+    Param:
+        price (np.ndarray): Price series
+        short_ma (np.ndarray): Short moving average (NaN during warm-up)
+        long_ma (np.ndarray): Long moving average (NaN during warm-up)
+        tc (float): Percentage cost per transaction
+
+    Returns (net_returns, cumret, bh_cumret, signal). net_returns has the dtype
+    of price, cumret and bh_cumret are always float64 so long series don't
+    drift; signal is an int8 array of +1 (long) or -1 (short), chosen with a
+    conditional move rather than a branch.
+    """
+    n = len(price)
+    net_returns = np.empty_like(price)
+    net_returns[:] = np.nan
+    cumret = np.full(n, np.nan)
+    bh_cumret = np.full(n, np.nan)
+    signals = np.empty(n, dtype=np.int8)  # +-1 fits in a byte
+
+    if n == 0:
+        return net_returns, cumret, bh_cumret, signals
+
+    prev_signal = 1 if short_ma[0] > long_ma[0] else -1
+    signals[0] = prev_signal
+    prev_position = np.nan
+    started = False
+    log_cum = 0.0
+    bh = 1.0
+
+    for i in range(1, n):
+        signal = 1 if short_ma[i] > long_ma[i] else -1
+        position = signal - prev_signal
+
+        if started:
+            pct = price[i] / price[i - 1] - 1
+            strat = prev_signal * pct
+            cost = abs(prev_position) * tc  # Cost of the previous day's trade, as positions.shift(1)
+            net = strat - cost
+            log_cum += np.log1p(net)
+            bh *= 1 + pct
+            net_returns[i] = net
+            cumret[i] = log_cum
+            bh_cumret[i] = bh
+        elif not (np.isnan(short_ma[i]) or np.isnan(long_ma[i])):
+            started = True  # First row with both MAs; its return needs the prior signal
+
+        signals[i] = signal
+        prev_signal = signal
+        prev_position = position
+
+    # Separate elementwise pass so exp vectorises (NaN warm-up rows stay NaN)
+    cumret = np.exp(cumret)
+
+    return net_returns, cumret, bh_cumret, signals
+
+
+
+
+@njit(cache=True)
+def max_drawdown(cumret):
+    """
+    Largest peak-to-trough decline of a cumulative return series.
+
+    Single scan tracking the running peak, in place of
+    (cumret / cummax(cumret) - 1).min() and its two temporaries.
+    """
+    peak = cumret[0]
+    dd = 0.0
+    for x in cumret:
+        peak = max(peak, x)
+        d = x / peak - 1
+        if d < dd:
+            dd = d
+    return dd
+
+
+
+
+@njit(cache=True, parallel=True)
+def grid_backtest(price, shorts, longs, tc):
+    """
+    Backtest many (short, long) window pairs in one parallel kernel.
+
+    Pair k uses shorts[k] and longs[k]; pairs are spread across threads with
+    prange and all of them read the same price array. Metrics follow
+    compute_metrics(): returns start the day after the first row with both
+    moving averages, and the Sharpe ratio uses the sample standard deviation.
+
+    Param:
+        price (np.ndarray): Price series
+        shorts (np.ndarray): Short moving average window for each pair
+        longs (np.ndarray): Long moving average window for each pair
+        tc (float): Percentage cost per transaction
+
+    Returns (total_return, sharpe_ratio, max_drawdown) as float64 arrays, one entry per pair.
+    """
+    g = len(shorts)
+    total = np.full(g, np.nan)
+    sharpe = np.full(g, np.nan)
+    max_dd = np.full(g, np.nan)
+
+    for k in prange(g):
+        short_ma, long_ma = rolling_two_sma(price, shorts[k], longs[k])
+        net_returns, cumret, _, _ = compute_strategy(price, short_ma, long_ma, tc)
+
+        start = max(shorts[k], longs[k], 2)  # First row with a return
+        m = len(price) - start
+        if m < 1:
+            continue
+
+        mean = 0.0
+        for i in range(start, len(price)):
+            mean += net_returns[i]
+        mean /= m
+
+        var = 0.0
+        for i in range(start, len(price)):
+            var += (net_returns[i] - mean) ** 2
+
+        total[k] = cumret[-1] - 1
+        max_dd[k] = max_drawdown(cumret[start:])
+        if m > 1:
+            sharpe[k] = np.sqrt(252) * mean / np.sqrt(var / (m - 1))
+
+    return total, sharpe, max_dd